@@ -1,35 +1,93 @@
-import json
+import io
+import os
+import sys
+try:
+    import orjson
+except ImportError:
+    import json as orjson
+try:
+    import ijson
+except ImportError:
+    ijson = None
 import pandas as pd
 import numpy as np
+import matplotlib
+matplotlib.use('Agg')
 import matplotlib.pyplot as plt
-import seaborn as sns
 from scipy import stats
-from scipy.stats import chi2_contingency, ks_2samp
 import warnings
 warnings.filterwarnings('ignore')
 
-# Set style for better-looking plots
-plt.style.use('seaborn-v0_8-darkgrid')
-sns.set_palette("husl")
+# Set style for better-looking plots: seaborn's darkgrid look and husl palette,
+# set directly so seaborn does not have to be imported
+HUSL_PALETTE = ['#f77189', '#bb9832', '#50b131', '#36ada4', '#3ba3ec', '#e866f4']
+plt.rcParams.update({
+    'axes.axisbelow': True,
+    'axes.edgecolor': 'white',
+    'axes.facecolor': '#EAEAF2',
+    'axes.grid': True,
+    'axes.labelcolor': '.15',
+    'axes.linewidth': 0.0,
+    'axes.prop_cycle': plt.cycler(color=HUSL_PALETTE),
+    'figure.facecolor': 'white',
+    'font.family': ['sans-serif'],
+    'font.sans-serif': ['Arial', 'Liberation Sans', 'DejaVu Sans', 'Bitstream Vera Sans', 'sans-serif'],
+    'grid.color': 'white',
+    'grid.linestyle': '-',
+    'image.cmap': 'Greys',
+    'legend.frameon': False,
+    'legend.numpoints': 1,
+    'legend.scatterpoints': 1,
+    'lines.solid_capstyle': 'round',
+    'text.color': '.15',
+    'xtick.color': '.15',
+    'xtick.direction': 'out',
+    'xtick.major.size': 0.0,
+    'xtick.minor.size': 0.0,
+    'ytick.color': '.15',
+    'ytick.direction': 'out',
+    'ytick.major.size': 0.0,
+    'ytick.minor.size': 0.0,
+})
+
+# Survey files at least this large are streamed one question at a time (needs ijson)
+STREAM_THRESHOLD_BYTES = 50 * 1024 * 1024
+
+def iter_questions(filepath):
+    """Yield survey questions one at a time, streaming large files with ijson"""
+    with open(filepath, 'rb') as f:
+        if ijson is not None and os.path.getsize(filepath) >= STREAM_THRESHOLD_BYTES:
+            yield from ijson.items(f, 'item')
+        else:
+            yield from orjson.loads(f.read())
 
 def load_and_prepare_data(filepath):
     """Load JSON data and convert to DataFrame"""
-    with open(filepath, 'r') as f:
-        data = json.load(f)
-    
-    # Convert to DataFrame
-    df_list = []
-    for question in data:
-        df_temp = pd.DataFrame({
-            'question_id': question['id'],
-            'question_text': question['text'],
-            'answer': question['answers']
-        })
-        df_temp['respondent_id'] = range(len(question['answers']))
-        df_list.append(df_temp)
-    
-    df = pd.concat(df_list, ignore_index=True)
-    return df, data
+    # Flatten into columns as questions are read and build the DataFrame in one go
+    question_ids = []
+    question_texts = []
+    answers = []
+    for question in iter_questions(filepath):
+        n_answers = len(question['answers'])
+        question_ids.extend([question['id']] * n_answers)
+        question_texts.extend([question['text']] * n_answers)
+        answers.extend(question['answers'])
+    
+    df = pd.DataFrame({
+        'question_id': pd.Categorical(question_ids),
+        'question_text': pd.Categorical(question_texts),
+        'answer': answers
+    })
+    
+    # Index by question so lookups are hashed rather than full-column scans
+    df = df.set_index('question_id').sort_index(kind='stable')
+    return df
+
+def get_answers(df, q_id):
+    """Look up all answers to a question via the question_id index"""
+    if q_id not in df.index:
+        return df['answer'].iloc[:0]
+    return df.loc[[q_id], 'answer']
 
 def identify_likert_questions(df):
     """Identify Likert scale questions for each prototype"""
@@ -62,18 +120,39 @@ def get_likert_data(df, likert_questions):
     """Extract and organize Likert scale data"""
     likert_data = {}
     
+    # Look up only the Likert questions' answers, keep whole-number answers,
+    # and convert them before grouping by question
+    # (isdecimal() accepts exactly the digits int() can parse, e.g. fullwidth '３')
+    likert_ids = [q_id for questions in likert_questions.values()
+                  for q_id, _ in questions if q_id in df.index]
+    answers = df.loc[likert_ids, 'answer'].dropna()
+    numeric = answers[answers.str.isdecimal()].map(int)
+    
+    # Ratings are 1-5, so once out-of-range values are dropped int8 is enough downstream
+    numeric = numeric[numeric.between(1, 5)].astype(np.int8)
+    grouped = numeric.groupby(level='question_id', observed=True)
+    answers_by_question = {q_id: values.to_numpy() for q_id, values in grouped}
+    no_answers = np.empty(0, dtype=np.int8)
+    
     for prototype, questions in likert_questions.items():
         prototype_data = {}
         for q_id, q_label in questions:
-            # Get answers for this question
-            answers = df[df['question_id'] == q_id]['answer'].values
-            # Convert to numeric
-            numeric_answers = [int(a) for a in answers if a.isdigit()]
-            prototype_data[q_label] = numeric_answers
+            prototype_data[q_label] = answers_by_question.get(q_id, no_answers)
         likert_data[prototype] = prototype_data
     
     return likert_data
 
+def build_rating_histograms(likert_data):
+    """Count ratings 1-5 for each prototype and question"""
+    histograms = {}
+    
+    for prototype, questions in likert_data.items():
+        for question, values in questions.items():
+            counts = np.bincount(values, minlength=6)[1:6]
+            histograms[(prototype, question)] = counts
+    
+    return histograms
+
 def calculate_descriptive_stats(likert_data):
     """Calculate descriptive statistics for each prototype and question"""
     stats_results = {}
@@ -81,19 +160,24 @@ def calculate_descriptive_stats(likert_data):
     for prototype, questions in likert_data.items():
         prototype_stats = {}
         for question, values in questions.items():
+            # Share the sum and sum of squares between mean and std
+            x = values.astype(np.float64)
+            n = x.size
+            mean = x.sum() / n
+            var = max(x @ x - n * mean * mean, 0.0) / (n - 1)
             prototype_stats[question] = {
-                'mean': np.mean(values),
-                'median': np.median(values),
-                'std': np.std(values, ddof=1),
-                'min': np.min(values),
-                'max': np.max(values),
-                'n': len(values)
+                'mean': mean,
+                'median': np.median(x),
+                'std': np.sqrt(var),
+                'min': values.min(),
+                'max': values.max(),
+                'n': n
             }
         stats_results[prototype] = prototype_stats
     
     return stats_results
 
-def create_bar_charts(likert_data, stats_results):
+def create_bar_charts(likert_data, stats_results, histograms):
     """Create bar charts for comparing prototypes"""
     questions = list(next(iter(likert_data.values())).keys())
     n_questions = len(questions)
@@ -115,10 +199,7 @@ def create_bar_charts(likert_data, stats_results):
         ax.grid(axis='y', alpha=0.3)
         
         # Add value labels on bars
-        for bar, mean in zip(bars, means):
-            height = bar.get_height()
-            ax.text(bar.get_x() + bar.get_width()/2., height + 0.1,
-                   f'{mean:.2f}', ha='center', va='bottom')
+        ax.bar_label(bars, labels=[f'{mean:.2f}' for mean in means], padding=2)
     
     # Remove extra subplot if any
     if idx < len(axes) - 1:
@@ -127,7 +208,7 @@ def create_bar_charts(likert_data, stats_results):
     plt.suptitle('Mean Scores Comparison Across Prototypes', fontsize=16, fontweight='bold')
     plt.tight_layout()
     plt.savefig('./mean_scores_comparison.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    plt.close(fig)
     
     # Create distribution plots
     fig, axes = plt.subplots(n_questions, 3, figsize=(15, n_questions * 3))
@@ -136,9 +217,7 @@ def create_bar_charts(likert_data, stats_results):
         for p_idx, prototype in enumerate(['A', 'B', 'C']):
             ax = axes[q_idx, p_idx] if n_questions > 1 else axes[p_idx]
             
-            data = likert_data[prototype][question]
-            # Create histogram with counts
-            counts = [data.count(i) for i in range(1, 6)]
+            counts = histograms[(prototype, question)]
             bars = ax.bar(range(1, 6), counts, color=f'C{p_idx}')
             
             ax.set_xlabel('Rating')
@@ -148,17 +227,34 @@ def create_bar_charts(likert_data, stats_results):
             ax.set_xlim(0.5, 5.5)
             
             # Add value labels on bars
-            for bar, count in zip(bars, counts):
-                if count > 0:
-                    ax.text(bar.get_x() + bar.get_width()/2., count + 0.1,
-                           str(count), ha='center', va='bottom')
+            ax.bar_label(bars, labels=[str(count) if count > 0 else '' for count in counts], padding=2)
     
     plt.suptitle('Response Distribution for Each Prototype and Question', fontsize=16, fontweight='bold')
     plt.tight_layout()
     plt.savefig('./distribution_plots.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    plt.close(fig)
 
-def perform_chi_squared_omnibus(likert_data):
+def chi2_statistic(observed):
+    """Compute the Pearson chi-squared statistic and dof for a contingency table"""
+    expected = np.outer(observed.sum(axis=1), observed.sum(axis=0)) / observed.sum()
+    terms = np.divide((observed - expected) ** 2, expected,
+                      out=np.zeros_like(expected), where=expected > 0)
+    chi2 = terms.sum()
+    
+    dof = (observed.shape[0] - 1) * (observed.shape[1] - 1)
+    return chi2, dof
+
+def chi2_test(observed):
+    """Chi-squared test of independence (no continuity correction)"""
+    observed = np.asarray(observed)
+    if (observed.sum(axis=1) == 0).any():
+        raise ValueError('The contingency table has a row of zeros')
+    
+    chi2, dof = chi2_statistic(observed)
+    p_value = stats.chi2.sf(chi2, dof) if dof > 0 else 1.0
+    return chi2, p_value, dof
+
+def perform_chi_squared_omnibus(likert_data, histograms):
     """Perform chi-squared omnibus test for each question across all prototypes"""
     questions = list(next(iter(likert_data.values())).keys())
     omnibus_results = {}
@@ -166,14 +262,8 @@ def perform_chi_squared_omnibus(likert_data):
     for question in questions:
         # Create contingency table
         # Rows: Prototypes, Columns: Ratings (1-5)
-        contingency_table = []
-        
-        for prototype in ['A', 'B', 'C']:
-            data = likert_data[prototype][question]
-            row = [data.count(i) for i in range(1, 6)]
-            contingency_table.append(row)
-        
-        contingency_table = np.array(contingency_table)
+        contingency_table = np.vstack([histograms[(prototype, question)]
+                                       for prototype in ['A', 'B', 'C']])
         
         # Check if we have any empty columns (ratings not used)
         # If so, we'll remove them for the test
@@ -183,7 +273,7 @@ def perform_chi_squared_omnibus(likert_data):
         # Only perform test if we have variation
         if filtered_table.size > 0 and filtered_table.sum() > 0:
             try:
-                chi2, p_value, dof, expected = chi2_contingency(filtered_table)
+                chi2, p_value, dof = chi2_test(filtered_table)
                 
                 omnibus_results[question] = {
                     'chi2': chi2,
@@ -214,7 +304,23 @@ def perform_chi_squared_omnibus(likert_data):
     
     return omnibus_results
 
-def perform_pairwise_ks_tests(likert_data, omnibus_results):
+def ks_statistic(counts1, counts2):
+    """Compute the two-sample KS statistic from two rating histograms"""
+    # Largest gap between the two empirical CDFs, evaluated at each rating
+    cdf1 = np.cumsum(counts1) / counts1.sum()
+    cdf2 = np.cumsum(counts2) / counts2.sum()
+    return np.abs(cdf1 - cdf2).max()
+
+def ks_test(counts1, counts2):
+    """Two-sample KS test on rating histograms"""
+    d = ks_statistic(counts1, counts2)
+    
+    # Rebuild the sorted samples so ks_2samp picks the same (exact for small samples) p-value
+    ratings = np.arange(1, 6)
+    p_value = stats.ks_2samp(np.repeat(ratings, counts1), np.repeat(ratings, counts2)).pvalue
+    return d, p_value
+
+def perform_pairwise_ks_tests(histograms, omnibus_results):
     """Perform pairwise Kolmogorov-Smirnov tests for significant omnibus results"""
     pairwise_results = {}
     
@@ -224,11 +330,11 @@ def perform_pairwise_ks_tests(likert_data, omnibus_results):
             pairwise_results[question] = {}
             
             for p1, p2 in pairs:
-                data1 = likert_data[p1][question]
-                data2 = likert_data[p2][question]
+                counts1 = histograms[(p1, question)]
+                counts2 = histograms[(p2, question)]
                 
                 # Perform KS test
-                ks_stat, p_value = ks_2samp(data1, data2)
+                ks_stat, p_value = ks_test(counts1, counts2)
                 
                 # Apply Bonferroni correction (3 comparisons)
                 adjusted_p = p_value * 3
@@ -250,25 +356,25 @@ def analyze_ranking_questions(df):
         '1763434721787': 'WORST'
     }
     
+    prototypes = ['Prototype A', 'Prototype B', 'Prototype C']
     ranking_results = {}
     
     for q_id, label in ranking_questions.items():
         # Get answers
-        answers = df[df['question_id'] == q_id]['answer'].values
+        answers = get_answers(df, q_id)
         
         # Count frequencies
-        prototype_counts = {
-            'Prototype A': sum(1 for a in answers if 'Prototype A' in a),
-            'Prototype B': sum(1 for a in answers if 'Prototype B' in a),
-            'Prototype C': sum(1 for a in answers if 'Prototype C' in a)
-        }
+        counts = (answers.str.extract(r'(Prototype [ABC])', expand=False)
+                  .value_counts()
+                  .reindex(prototypes, fill_value=0))
+        prototype_counts = dict(zip(prototypes, counts.tolist()))
         
         # Expected frequencies (equal distribution)
         n_total = sum(prototype_counts.values())
         expected = n_total / 3
         
         # Chi-squared test
-        observed = list(prototype_counts.values())
+        observed = counts.to_numpy()
         chi2, p_value = stats.chisquare(observed, [expected] * 3)
         
         ranking_results[label] = {
@@ -299,9 +405,7 @@ def create_ranking_visualization(ranking_results):
         ax.set_ylim(0, max(counts) * 1.2)
         
         # Add value labels on bars
-        for bar, count in zip(bars, counts):
-            ax.text(bar.get_x() + bar.get_width()/2., count + 0.5,
-                   str(count), ha='center', va='bottom', fontweight='bold')
+        ax.bar_label(bars, labels=[str(count) for count in counts], padding=2, fontweight='bold')
         
         # Add horizontal line for expected value
         expected = results['total_responses'] / 3
@@ -311,60 +415,60 @@ def create_ranking_visualization(ranking_results):
     plt.suptitle('Prototype Rankings Analysis', fontsize=16, fontweight='bold')
     plt.tight_layout()
     plt.savefig('./ranking_analysis.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    plt.close(fig)
 
-def print_results(stats_results, omnibus_results, pairwise_results, ranking_results):
-    """Print formatted results"""
-    print("=" * 80)
-    print("DESCRIPTIVE STATISTICS")
-    print("=" * 80)
+def print_results(stats_results, omnibus_results, pairwise_results, ranking_results, file=None):
+    """Print formatted results to file (stdout by default)"""
+    print("=" * 80, file=file)
+    print("DESCRIPTIVE STATISTICS", file=file)
+    print("=" * 80, file=file)
     
     for prototype in ['A', 'B', 'C']:
-        print(f"\n--- Prototype {prototype} ---")
+        print(f"\n--- Prototype {prototype} ---", file=file)
         for question, stats in stats_results[prototype].items():
-            print(f"\n{question}:")
-            print(f"  Mean: {stats['mean']:.2f} (SD: {stats['std']:.2f})")
-            print(f"  Median: {stats['median']:.1f}")
-            print(f"  Range: {stats['min']}-{stats['max']}")
-            print(f"  N: {stats['n']}")
+            print(f"\n{question}:", file=file)
+            print(f"  Mean: {stats['mean']:.2f} (SD: {stats['std']:.2f})", file=file)
+            print(f"  Median: {stats['median']:.1f}", file=file)
+            print(f"  Range: {stats['min']}-{stats['max']}", file=file)
+            print(f"  N: {stats['n']}", file=file)
     
-    print("\n" + "=" * 80)
-    print("CHI-SQUARED OMNIBUS TESTS (Across All Three Prototypes)")
-    print("=" * 80)
+    print("\n" + "=" * 80, file=file)
+    print("CHI-SQUARED OMNIBUS TESTS (Across All Three Prototypes)", file=file)
+    print("=" * 80, file=file)
     
     for question, results in omnibus_results.items():
-        print(f"\n{question}:")
+        print(f"\n{question}:", file=file)
         if 'note' in results:
-            print(f"  {results['note']}")
+            print(f"  {results['note']}", file=file)
         else:
-            print(f"  χ² = {results['chi2']:.3f}, p = {results['p_value']:.4f}")
-            print(f"  Significant: {'YES' if results['significant'] else 'NO'}")
+            print(f"  χ² = {results['chi2']:.3f}, p = {results['p_value']:.4f}", file=file)
+            print(f"  Significant: {'YES' if results['significant'] else 'NO'}", file=file)
             if results['significant']:
-                print("  → Proceeding with pairwise comparisons")
+                print("  → Proceeding with pairwise comparisons", file=file)
     
-    print("\n" + "=" * 80)
-    print("PAIRWISE KOLMOGOROV-SMIRNOV TESTS (Bonferroni Corrected)")
-    print("=" * 80)
+    print("\n" + "=" * 80, file=file)
+    print("PAIRWISE KOLMOGOROV-SMIRNOV TESTS (Bonferroni Corrected)", file=file)
+    print("=" * 80, file=file)
     
     for question, pairs in pairwise_results.items():
-        print(f"\n{question}:")
+        print(f"\n{question}:", file=file)
         for pair, results in pairs.items():
-            print(f"  {pair}:")
-            print(f"    KS statistic: {results['ks_statistic']:.3f}")
-            print(f"    p-value (raw): {results['p_value']:.4f}")
-            print(f"    p-value (adjusted): {results['adjusted_p_value']:.4f}")
-            print(f"    Significant: {'YES' if results['significant'] else 'NO'}")
+            print(f"  {pair}:", file=file)
+            print(f"    KS statistic: {results['ks_statistic']:.3f}", file=file)
+            print(f"    p-value (raw): {results['p_value']:.4f}", file=file)
+            print(f"    p-value (adjusted): {results['adjusted_p_value']:.4f}", file=file)
+            print(f"    Significant: {'YES' if results['significant'] else 'NO'}", file=file)
     
-    print("\n" + "=" * 80)
-    print("RANKING QUESTIONS ANALYSIS")
-    print("=" * 80)
+    print("\n" + "=" * 80, file=file)
+    print("RANKING QUESTIONS ANALYSIS", file=file)
+    print("=" * 80, file=file)
     
     for label, results in ranking_results.items():
-        print(f"\n{label}:")
+        print(f"\n{label}:", file=file)
         for prototype, count in results['counts'].items():
-            print(f"  {prototype}: {count} votes")
-        print(f"  χ² = {results['chi2']:.3f}, p = {results['p_value']:.4f}")
-        print(f"  Significant: {'YES' if results['significant'] else 'NO'}")
+            print(f"  {prototype}: {count} votes", file=file)
+        print(f"  χ² = {results['chi2']:.3f}, p = {results['p_value']:.4f}", file=file)
+        print(f"  Significant: {'YES' if results['significant'] else 'NO'}", file=file)
 
 def create_summary_table(stats_results):
     """Create a summary table of mean scores"""
@@ -408,19 +512,20 @@ def create_summary_table(stats_results):
     
     plt.title('Summary of Mean Scores ± Standard Deviation', fontsize=14, fontweight='bold')
     plt.savefig('./summary_table.png', dpi=300, bbox_inches='tight')
-    plt.show()
+    plt.close(fig)
     
     return summary_df
 
 def main():
     # Load data
     print("Loading data...")
-    df, raw_data = load_and_prepare_data('./survey_data.json')
+    df = load_and_prepare_data('./survey_data.json')
     
     # Identify and extract Likert scale questions
     print("Processing Likert scale questions...")
     likert_questions = identify_likert_questions(df)
     likert_data = get_likert_data(df, likert_questions)
+    histograms = build_rating_histograms(likert_data)
     
     # Calculate descriptive statistics
     print("Calculating descriptive statistics...")
@@ -428,14 +533,14 @@ def main():
     
     # Create visualizations
     print("Creating visualizations...")
-    create_bar_charts(likert_data, stats_results)
+    create_bar_charts(likert_data, stats_results, histograms)
     
     # Perform statistical tests
     print("Performing chi-squared omnibus tests...")
-    omnibus_results = perform_chi_squared_omnibus(likert_data)
+    omnibus_results = perform_chi_squared_omnibus(likert_data, histograms)
     
     print("Performing pairwise Kolmogorov-Smirnov tests...")
-    pairwise_results = perform_pairwise_ks_tests(likert_data, omnibus_results)
+    pairwise_results = perform_pairwise_ks_tests(histograms, omnibus_results)
     
     # Analyze ranking questions
     print("Analyzing ranking questions...")
@@ -449,16 +554,15 @@ def main():
     # Print all results
     print("\n" + "=" * 80)
     print("ANALYSIS COMPLETE - RESULTS SUMMARY")
-    print_results(stats_results, omnibus_results, pairwise_results, ranking_results)
+    buffer = io.StringIO()
+    print_results(stats_results, omnibus_results, pairwise_results, ranking_results, file=buffer)
+    results_text = buffer.getvalue()
+    sys.stdout.write(results_text)
     
     # Save results to file
     print("\nSaving results to file...")
     with open('./analysis_results.txt', 'w') as f:
-        import sys
-        original_stdout = sys.stdout
-        sys.stdout = f
-        print_results(stats_results, omnibus_results, pairwise_results, ranking_results)
-        sys.stdout = original_stdout
+        f.write(results_text)
     
     print("\nAnalysis complete! Check the generated plots and analysis_results.txt for detailed results.")
     